@@ -1,46 +1,34 @@
 """
 This module provides a Flask application for GitHub data fetching and display.
+
+The application is built by ``create_app``. Importing this module only defines
+the models and views; the GitLab fetch stack (``util.context`` and everything
+it pulls in) is imported on the first report job, and the database schema is
+created by the ``init-db`` command instead of at import time.
 """
 
+import asyncio
 import json
 import logging
+import mimetypes
 import os
-import threading
+import time
 
-import requests
+import click
 from dotenv import load_dotenv
-from flask import (Flask, jsonify, redirect, render_template, request,
-                   send_from_directory, session, url_for)
+from flask import (Blueprint, Flask, current_app, jsonify, redirect,
+                   render_template, request, send_from_directory, session,
+                   url_for)
 from flask_sqlalchemy import SQLAlchemy
 
 from log.logging_config import setup_logging
-from util.context import get_context
+from util.cache import get_profile, project_metadata_cache, put_profile
 
 
 baseurl = "http://127.0.0.1:9999"
 
-setup_logging()
-
-app = Flask(__name__)
-app.debug = True
-
-def app_preparation():
-    """
-    Function to prepare the application.
-    """
-    app.secret_key = os.urandom(24)
-
-    load_dotenv()
-    app.config["CLIENT_ID"] = os.getenv("CLIENT_ID")
-    app.config["CLIENT_SECRET"] = os.getenv("CLIENT_SECRET")
-
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///my-github-2024.db"
-
-
-app_preparation()
-
-
-db = SQLAlchemy(app)
+db = SQLAlchemy()
+bp = Blueprint("main", __name__, cli_group=None)
 
 
 class RequestedUser(db.Model):
@@ -62,55 +50,122 @@ class UserContext(db.Model):
     context = db.Column(db.Text, nullable=False)
 
 
-def db_preparation():
+def create_app(test_config: dict | None = None) -> Flask:
     """
-    Function to prepare the database.
+    Application factory.
+
+    Args:
+        test_config (dict | None): Config values overriding the defaults, e.g. the
+            database URI of a load test.
+
+    Returns:
+        Flask: The configured application.
     """
-    with app.app_context():
-        db.create_all()
-        missing_users = (
-            db.session.query(RequestedUser)
-            .outerjoin(UserContext, RequestedUser.username == UserContext.username)
-            .filter(UserContext.username is None)
-            .all()
+    start = time.perf_counter()
+
+    setup_logging()
+    load_dotenv()
+
+    # Static files go through static_files, which knows about fingerprinted assets.
+    app = Flask(__name__, static_folder=None)
+    app.debug = True
+    app.secret_key = os.urandom(24)
+    app.config["CLIENT_ID"] = os.getenv("CLIENT_ID")
+    app.config["CLIENT_SECRET"] = os.getenv("CLIENT_SECRET")
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///my-github-2024.db"
+    app.config["PROJECT_METADATA_DB"] = os.path.join(app.instance_path, "project-metadata.db")
+    if test_config is not None:
+        app.config.update(test_config)
+    project_metadata_cache.path = app.config["PROJECT_METADATA_DB"]
+
+    try:
+        with open(os.path.join(app.root_path, "static", "dist", "manifest.json"),
+                  encoding="utf-8") as manifest:
+            app.config["ASSET_MANIFEST"] = json.load(manifest)
+    except FileNotFoundError:
+        logging.warning("No asset manifest, run script/build_static.py")
+        app.config["ASSET_MANIFEST"] = {}
+    app.jinja_env.globals["asset"] = asset_url
+
+    db.init_app(app)
+    app.register_blueprint(bp)
+
+    logging.info("Application created in %.1f ms", (time.perf_counter() - start) * 1000)
+    return app
+
+
+def asset_url(path: str) -> str:
+    """
+    Get the URL of a static asset, fingerprinted when the assets have been built.
+
+    Args:
+        path (str): The path relative to ``static/``, e.g. ``style/main.css``.
+
+    Returns:
+        str: The URL of the asset.
+    """
+    return "/static/" + current_app.config["ASSET_MANIFEST"].get(path, path)
+
+
+def reconcile_requested_users() -> int:
+    """
+    Delete requested users whose context was never stored.
+
+    Runs as a single ``DELETE ... WHERE NOT EXISTS`` statement, which SQLite
+    answers from the unique index on ``user_context.username``.
+
+    Returns:
+        int: The number of deleted rows.
+    """
+    result = db.session.execute(
+        db.delete(RequestedUser).where(
+            ~db.exists().where(UserContext.username == RequestedUser.username)
         )
-        for user in missing_users:
-            logging.info("Missing user: %s", user.username)
-            db.session.query(RequestedUser).filter_by(username=user.username).delete()
-        db.session.commit()
+    )
+    db.session.commit()
+    return result.rowcount
 
 
-db_preparation()
+@bp.cli.command("init-db")
+def init_db():
+    """
+    Create the database schema and drop unfinished report requests.
+    """
+    db.create_all()
+    missing_users = reconcile_requested_users()
+    logging.info("Removed %d missing users", missing_users)
+    click.echo(f"Database ready, removed {missing_users} missing users.")
 
 
-@app.before_request
+@bp.before_app_request
 def before_request():
     """
     Function to handle actions before each request.
     """
     if (
-        request.endpoint not in ("status", "index", "login", "callback", "static")
+        request.endpoint
+        not in ("main.status", "main.index", "main.login", "main.callback", "main.static_files")
         and "access_token" not in session
     ):
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
 
     if request.endpoint not in (
-        "status",
-        "index",
-        "login",
-        "callback",
-        "dashboard",
-        "load",
-        "wait",
-        "display",
-        "static",
+        "main.status",
+        "main.index",
+        "main.login",
+        "main.callback",
+        "main.dashboard",
+        "main.load",
+        "main.wait",
+        "main.display",
+        "main.static_files",
     ):
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
 
     return None
 
 
-@app.route("/status", methods=["GET"])
+@bp.route("/status", methods=["GET"])
 def status():
     """
     Endpoint to check the status of the application.
@@ -118,56 +173,58 @@ def status():
     return jsonify({"status": "ok"}), 200
 
 
-@app.route("/", methods=["GET"])
+@bp.route("/", methods=["GET"])
 def index():
     """
     Endpoint for the index page.
     """
     if session.get("access_token"):
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
     return render_template("login.html")
 
 
-@app.route("/login", methods=["GET"])
+@bp.route("/login", methods=["GET"])
 def login():
     """
     Endpoint for the login page.
     """
     if session.get("access_token"):
-        return redirect(url_for("dashboard"))
+        return redirect(url_for("main.dashboard"))
     gitlab_authorize_url = baseurl + "/oauth/authorize"
-    redirect_uri = url_for('callback', _external=True)
+    redirect_uri = url_for('main.callback', _external=True)
     return redirect(
-        f"{gitlab_authorize_url}?client_id={app.config['CLIENT_ID']}&response_type=code&redirect_uri={redirect_uri}&scope=api"
+        f"{gitlab_authorize_url}?client_id={current_app.config['CLIENT_ID']}&response_type=code&redirect_uri={redirect_uri}&scope=api"
     )
 
 
-@app.route("/callback", methods=["GET"])
+@bp.route("/callback", methods=["GET"])
 def callback():
     """
     Endpoint for the GitLab OAuth callback.
     """
+    import requests  # pylint: disable=import-outside-toplevel
+
     logging.info("Callback received with args: %s", request.args)
     
     if "code" not in request.args:
         logging.error("No code found in request args")
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
 
     code = request.args.get("code")
     logging.info("Received authorization code: %s", code)
 
     if not code:
         logging.error("Code is None")
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
 
     try:
         # 记录请求详情
         request_data = {
-            "client_id": app.config["CLIENT_ID"],
-            "client_secret": app.config["CLIENT_SECRET"],  # 使用实际的 secret
+            "client_id": current_app.config["CLIENT_ID"],
+            "client_secret": current_app.config["CLIENT_SECRET"],  # 使用实际的 secret
             "code": code,
             "grant_type": "authorization_code",
-            "redirect_uri": url_for('callback', _external=True),
+            "redirect_uri": url_for('main.callback', _external=True),
         }
         
         # 添加更多的请求头
@@ -198,7 +255,7 @@ def callback():
                 logging.error("Invalid client credentials")
             elif token_response.status_code == 400:
                 logging.error("Invalid request parameters")
-            return redirect(url_for("index"))
+            return redirect(url_for("main.index"))
             
         token_json = token_response.json()
         logging.info("Token response parsed successfully: %s", {k: '***' if k == 'access_token' else v for k, v in token_json.items()})
@@ -206,52 +263,58 @@ def callback():
         access_token = token_json.get("access_token")
         if not access_token:
             logging.error("Access token not found in response")
-            return redirect(url_for("index"))
+            return redirect(url_for("main.index"))
             
         logging.info("Access token received successfully")
         
     except requests.exceptions.RequestException as e:
         logging.error("Request exception during token request: %s", str(e))
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
     except json.JSONDecodeError as e:
         logging.error("JSON decode error: %s", str(e))
         logging.error("Raw response content: %s", token_response.text)
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
     except Exception as e:
         logging.error("Unexpected error during token request: %s", str(e))
-        return redirect(url_for("index"))
+        return redirect(url_for("main.index"))
 
     session["access_token"] = access_token
     logging.info("Access token stored in session successfully")
-    return redirect(url_for("dashboard"))
+    return redirect(url_for("main.dashboard"))
 
 
-@app.route("/dashboard", methods=["GET"])
+@bp.route("/dashboard", methods=["GET"])
 def dashboard():
     """
     Endpoint for the dashboard page.
     """
     access_token = session.get("access_token")
 
-    headers = {"Authorization": f"Bearer {access_token}"}
+    user_data = get_profile(access_token)
+    if user_data is None:
+        import requests  # pylint: disable=import-outside-toplevel
 
-    user_response = requests.get(
-        "http://127.0.0.1:9999/api/v4/user", headers=headers, timeout=10
-    )
-    user_data = user_response.json()
-    logging.info("user_data: %s", user_data)
+        headers = {"Authorization": f"Bearer {access_token}"}
+
+        user_response = requests.get(
+            "http://127.0.0.1:9999/api/v4/user", headers=headers, timeout=10
+        )
+        user_data = user_response.json()
+        logging.info("user_data: %s", user_data)
+        if user_response.status_code == 200 and user_data.get("username"):
+            put_profile(access_token, user_data, owner=True)
 
     username = user_data.get("username")
     session["username"] = username
 
     if UserContext.query.filter_by(username=username).first():
-        return redirect(url_for("display"))
+        return redirect(url_for("main.display"))
     if RequestedUser.query.filter_by(username=username).first():
-        return redirect(url_for("wait"))
+        return redirect(url_for("main.wait"))
     return render_template("dashboard.html", user=user_data, access_token=access_token)
 
 
-@app.route("/load", methods=["POST"])
+@bp.route("/load", methods=["POST"])
 def load():
     """
     Endpoint to load user data.
@@ -263,7 +326,7 @@ def load():
     year = int(data.get("year"))
 
     if (not all([access_token, username, timezone, year])) or year < 2008 or year > 2030:
-        return jsonify({"redirect_url": url_for("index")})
+        return jsonify({"redirect_url": url_for("main.index")})
         
     session["access_token"] = access_token
     session["username"] = username
@@ -278,41 +341,49 @@ def load():
         logging.error("Error saving requested user: %s", e)
 
     if not all([username, access_token, year, timezone]):
-        return jsonify({"redirect_url": url_for("index", year=year)})
+        return jsonify({"redirect_url": url_for("main.index", year=year)})
 
-    def fetch_data():
-        logging.info("Fetching data from GitLab")
-        with app.app_context():
-            try:
-                context = get_context(baseurl,username, access_token, year, timezone)
+    # The GitLab stack (aiohttp, pytz) is only needed by report jobs.
+    # pylint: disable=import-outside-toplevel
+    from util.context import get_context_async
+    from util.fetch_data import get_engine
+
+    app = current_app._get_current_object()  # pylint: disable=protected-access
 
-                logging.info("Context of %s: %s", username, json.dumps(context))
-                
-                user_context = UserContext(username=username, context=json.dumps(context))
-                db.session.add(user_context)
-                db.session.commit()
-            except Exception as e:
-                logging.error("Error fetching data: %s", e)
+    def save_context(context: dict):
+        context_json = json.dumps(context)
+        logging.info("Context of %s: %s", username, context_json)
+        with app.app_context():
+            user_context = UserContext(username=username, context=context_json)
+            db.session.add(user_context)
+            db.session.commit()
 
+    async def fetch_data():
+        logging.info("Fetching data from GitLab")
+        try:
+            context = await get_context_async(baseurl,username, access_token, year, timezone)
+            # Serializing and storing the context would block the shared fetch loop
+            await asyncio.to_thread(save_context, context)
+        except Exception as e:
+            logging.error("Error fetching data: %s", e)
 
-    fetch_thread = threading.Thread(target=fetch_data)
-    fetch_thread.start()
+    get_engine().submit(fetch_data())
 
-    return jsonify({"redirect_url": url_for("wait")})
+    return jsonify({"redirect_url": url_for("main.wait")})
 
 
-@app.route("/wait", methods=["GET"])
+@bp.route("/wait", methods=["GET"])
 def wait():
     """
     Endpoint for the wait page.
     """
     username = session.get("username")
     if UserContext.query.filter_by(username=username).first():
-        return redirect(url_for("display"))
+        return redirect(url_for("main.display"))
     return render_template("wait.html")
 
 
-@app.route("/display", methods=["GET"])
+@bp.route("/display", methods=["GET"])
 def display():
     """
     Endpoint for the display page.
@@ -323,16 +394,35 @@ def display():
         return render_template(
             "template.html", context=json.loads(user_context.context)
         )
-    return redirect(url_for("wait"))
+    return redirect(url_for("main.wait"))
 
-@app.route("/static/<path:filename>", methods=["GET"])
+@bp.route("/static/<path:filename>", methods=["GET"])
 def static_files(filename):
     """
     Endpoint to serve static files.
+
+    Fingerprinted assets under ``dist/`` never change, so they are cached
+    forever and served precompressed when the client accepts it.
     """
-    return send_from_directory("static", filename)
+    if not filename.startswith("dist/"):
+        return send_from_directory("static", filename)
+
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if request.accept_encodings[encoding] and os.path.isfile(
+            os.path.join(current_app.root_path, "static", filename + suffix)
+        ):
+            response = send_from_directory(
+                "static", filename + suffix, mimetype=mimetypes.guess_type(filename)[0]
+            )
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory("static", filename)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    response.vary.add("Accept-Encoding")
+    return response
 
 
 if __name__ == "__main__":
 
-    app.run(host="127.0.0.1", port=5000)
+    create_app().run(host="127.0.0.1", port=5000)
@@ -0,0 +1,86 @@
+"""
+Build fingerprinted static assets into ``static/dist``.
+
+Every served file under ``static/`` is copied to ``static/dist`` with a content
+hash in its name, e.g. ``style/main.css`` -> ``dist/style/main.1a2b3c4d5e6f.css``.
+PNG and SVG images are optimized first, and text assets get ``.gz`` and ``.br``
+siblings. ``static/dist/manifest.json`` maps each original path to its
+fingerprinted one; the application reads it to build asset URLs, which nginx or
+the application serve with immutable caching.
+
+Usage:
+    pip3 install -r requirements-build.txt
+    python3 script/build_static.py
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import re
+import shutil
+from pathlib import Path
+
+import brotli
+from PIL import Image
+
+
+STATIC = Path(__file__).resolve().parent.parent / "static"
+DIST = STATIC / "dist"
+# Source files that are kept in the repository but never served
+SKIPPED_SUFFIXES = {".ai"}
+COMPRESSED_SUFFIXES = {".css", ".js", ".svg"}
+
+
+def _optimize(path: Path, data: bytes) -> bytes:
+    if path.suffix == ".svg":
+        return re.sub(rb">\s+<", b"><", re.sub(rb"<!--.*?-->", b"", data, flags=re.S)).strip()
+    if path.suffix == ".png":
+        output = io.BytesIO()
+        Image.open(io.BytesIO(data)).save(output, format="PNG", optimize=True)
+        return min(data, output.getvalue(), key=len)
+    return data
+
+
+def _write_compressed(target: Path, data: bytes) -> None:
+    variants = {
+        ".gz": gzip.compress(data, compresslevel=9, mtime=0),
+        ".br": brotli.compress(data, quality=11),
+    }
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            target.with_name(target.name + suffix).write_bytes(compressed)
+
+
+def build() -> dict:
+    """
+    Rebuild ``static/dist`` and its manifest.
+
+    Returns:
+        dict: The manifest, mapping paths relative to ``static/`` to their
+            fingerprinted paths.
+    """
+    shutil.rmtree(DIST, ignore_errors=True)
+    manifest = {}
+    for path in sorted(STATIC.rglob("*")):
+        if not path.is_file() or DIST in path.parents or path.suffix in SKIPPED_SUFFIXES:
+            continue
+        data = _optimize(path, path.read_bytes())
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        relative = path.relative_to(STATIC)
+        fingerprinted = Path("dist") / relative.with_name(f"{path.stem}.{digest}{path.suffix}")
+
+        target = STATIC / fingerprinted
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+        if path.suffix in COMPRESSED_SUFFIXES:
+            _write_compressed(target, data)
+        manifest[relative.as_posix()] = fingerprinted.as_posix()
+
+    (DIST / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+if __name__ == "__main__":
+    for source, built in build().items():
+        print(f"{source} -> {built}")
@@ -18,7 +18,13 @@ git reset --hard origin/main || { echo "Failed to reset codebase"; exit 1; }
 
 # Activate the virtual environment and install dependencies
 source venv/bin/activate || { echo "Failed to activate virtual environment"; exit 1; }
-pip install -r requirements.txt || { echo "Failed to install dependencies"; exit 1; }
+pip install -r requirements.txt -r requirements-build.txt || { echo "Failed to install dependencies"; exit 1; }
+
+# Build fingerprinted static assets
+python3 script/build_static.py > /dev/null || { echo "Failed to build static assets"; exit 1; }
+
+# Create the database schema and clean up unfinished requests
+flask --app my-github-2024 init-db || { echo "Failed to prepare database"; exit 1; }
 
 # Start the application
 nohup python3 my-github-2024.py > ./app.log 2>&1 &
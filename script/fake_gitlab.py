@@ -0,0 +1,183 @@
+"""
+A fake GitLab instance for load testing, serving the OAuth and REST endpoints the
+application uses with deterministic generated data.
+
+Authorizing with ``login=<username>`` yields the code ``<username>``, which is
+exchanged for the access token ``token-<username>``; every token resolves to
+its own user.
+
+Functions:
+    make_app(projects: int, commits: int, year: int) -> web.Application:
+        Build the fake GitLab application.
+    start(host: str, port: int, projects: int, commits: int, year: int) -> None:
+        Serve the fake GitLab from a daemon thread.
+"""
+
+import asyncio
+import random
+import threading
+import zlib
+
+from aiohttp import web
+
+
+MESSAGES = ["feat: add a", "fix(api): b", "docs: c", "update", "chore: d", "refactor e"]
+
+
+def _user(username: str) -> dict:
+    return {
+        "id": zlib.crc32(username.encode("utf-8")) % 1000000 + 1,
+        "username": username,
+        "name": username.title(),
+        "avatar_url": f"https://gitlab.invalid/{username}.png",
+        "created_at": "2019-05-01T10:00:00.000Z",
+        "email": f"{username}@example.com",
+    }
+
+
+def _token_user(request: web.Request) -> dict:
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    return _user(token.removeprefix("token-"))
+
+
+def _page(request: web.Request, items: list) -> web.Response:
+    per_page = int(request.query.get("per_page", 20))
+    page = int(request.query.get("page", 1))
+    total_pages = max(1, -(-len(items) // per_page))
+    headers = {
+        "X-Page": str(page),
+        "X-Total": str(len(items)),
+        "X-Total-Pages": str(total_pages),
+        "X-Next-Page": str(page + 1) if page < total_pages else "",
+    }
+    return web.json_response(items[(page - 1) * per_page: page * per_page], headers=headers)
+
+
+def make_app(projects: int = 20, commits: int = 100, year: int = 2024) -> web.Application:
+    """
+    Build the fake GitLab application.
+
+    Every user is a member of two thirds of the projects, and half of the
+    projects were active during the year.
+
+    Args:
+        projects (int): The number of projects.
+        commits (int): The number of commits in each project.
+        year (int): The year of the generated activity.
+
+    Returns:
+        web.Application: The application.
+    """
+    rng = random.Random(year)
+    project_list = [
+        {
+            "id": project_id,
+            "name": f"project-{project_id}",
+            "star_count": project_id % 5,
+            "forks_count": project_id % 3,
+            "visibility": "private" if project_id % 4 == 0 else "internal",
+            "created_at": f"{year - 2}-01-01T00:00:00.000Z",
+            "last_activity_at": (
+                f"{year}-06-01T00:00:00.000Z" if project_id % 2
+                else f"{year - 2}-06-01T00:00:00.000Z"
+            ),
+        }
+        for project_id in range(1, projects + 1)
+    ]
+    commit_times = [
+        f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        f"T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00.000+00:00"
+        for _ in range(commits)
+    ]
+
+    async def oauth_authorize(request: web.Request) -> web.Response:
+        login = request.query.get("login", "loadtest")
+        raise web.HTTPFound(f"{request.query['redirect_uri']}?code={login}")
+
+    async def oauth_token(request: web.Request) -> web.Response:
+        data = await request.json()
+        return web.json_response(
+            {"access_token": f"token-{data['code']}", "token_type": "Bearer"}
+        )
+
+    async def current_user(request: web.Request) -> web.Response:
+        return web.json_response(_token_user(request))
+
+    async def users(request: web.Request) -> web.Response:
+        return _page(request, [_user(request.query["username"])])
+
+    async def follows(request: web.Request) -> web.Response:
+        return _page(request, [{"id": user_id} for user_id in range(3)])
+
+    async def list_projects(request: web.Request) -> web.Response:
+        after = request.query.get("last_activity_after", "")
+        return _page(request, [p for p in project_list if p["last_activity_at"] >= after])
+
+    async def members(request: web.Request) -> web.Response:
+        member_ids = [{"id": 0}]
+        if int(request.match_info["project_id"]) % 3:
+            member_ids.append({"id": _token_user(request)["id"]})
+        return _page(request, member_ids)
+
+    async def languages(request: web.Request) -> web.Response:
+        project_id = int(request.match_info["project_id"])
+        return web.json_response({["Python", "Go", "JavaScript"][project_id % 3]: 100.0})
+
+    async def list_commits(request: web.Request) -> web.Response:
+        user = _token_user(request)
+        project_id = int(request.match_info["project_id"])
+        return _page(request, [
+            {
+                "id": f"{project_id:08x}{index:032x}",
+                "message": MESSAGES[index % len(MESSAGES)],
+                "created_at": created_at,
+                "author_name": user["username"] if index % 2 else "someone",
+                "author_email": user["email"] if index % 2 else "someone@example.com",
+                "committer_name": user["username"],
+                "committer_email": user["email"],
+            }
+            for index, created_at in enumerate(commit_times)
+        ])
+
+    async def list_items(request: web.Request) -> web.Response:
+        project_id = int(request.match_info["project_id"])
+        return _page(request, [{"iid": iid} for iid in range(project_id % 4)])
+
+    app = web.Application()
+    app.router.add_get("/oauth/authorize", oauth_authorize)
+    app.router.add_post("/oauth/token", oauth_token)
+    app.router.add_get("/api/v4/user", current_user)
+    app.router.add_get("/api/v4/users", users)
+    app.router.add_get("/api/v4/users/{user_id}/followers", follows)
+    app.router.add_get("/api/v4/users/{user_id}/following", follows)
+    app.router.add_get("/api/v4/projects", list_projects)
+    app.router.add_get("/api/v4/projects/{project_id}/members", members)
+    app.router.add_get("/api/v4/projects/{project_id}/languages", languages)
+    app.router.add_get("/api/v4/projects/{project_id}/repository/commits", list_commits)
+    app.router.add_get("/api/v4/projects/{project_id}/merge_requests", list_items)
+    app.router.add_get("/api/v4/projects/{project_id}/issues", list_items)
+    return app
+
+
+def start(host: str = "127.0.0.1", port: int = 9999, projects: int = 20,
+          commits: int = 100, year: int = 2024) -> None:
+    """
+    Serve the fake GitLab from a daemon thread, returning once it accepts connections.
+
+    Args:
+        host (str): The host to bind.
+        port (int): The port to bind.
+        projects (int): The number of projects.
+        commits (int): The number of commits in each project.
+        year (int): The year of the generated activity.
+    """
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(make_app(projects, commits, year), access_log=None)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, host, port).start())
+    threading.Thread(target=loop.run_forever, name="fake-gitlab", daemon=True).start()
+
+
+if __name__ == "__main__":
+    start()
+    threading.Event().wait()
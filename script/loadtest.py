@@ -0,0 +1,263 @@
+"""
+Load test for the web tier.
+
+Starts the fake GitLab on 127.0.0.1:9999 (the address the application talks to)
+and the application on a threaded local server backed by a throwaway database.
+Each simulated session then goes through login -> OAuth stub -> callback ->
+dashboard -> load -> wait polling -> display, and the report prints throughput,
+p50/p99 latency, database lock errors and the peak number of application threads
+per endpoint.
+
+Application threads are every thread except the simulated clients and the fake
+GitLab: the server's request threads, the fetch engine and its worker threads.
+
+Usage:
+    python3 script/loadtest.py --sessions 200 --concurrency 50
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from flask import has_request_context, request
+from werkzeug.serving import make_server
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from script import fake_gitlab  # pylint: disable=wrong-import-position
+
+CLIENT_THREAD_PREFIX = "loadtest-client"
+NON_APP_THREADS = (CLIENT_THREAD_PREFIX, "fake-gitlab", "MainThread")
+
+
+def _app_threads() -> int:
+    return sum(1 for thread in threading.enumerate() if not thread.name.startswith(NON_APP_THREADS))
+
+
+class Stats:
+    """
+    Thread-safe collector of per-endpoint latencies, errors and application
+    thread counts.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.threads = defaultdict(int)
+        self.peak_threads = 0
+        self.completed = 0
+        self._lock = threading.Lock()
+
+    def sample_threads(self) -> None:
+        """
+        Record the current number of application threads.
+        """
+        thread_count = _app_threads()
+        with self._lock:
+            self.peak_threads = max(self.peak_threads, thread_count)
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        """
+        Record one request.
+
+        Args:
+            endpoint (str): The endpoint path.
+            seconds (float): The latency.
+            ok (bool): Whether the response was the expected one.
+        """
+        thread_count = _app_threads()
+        with self._lock:
+            self.latencies[endpoint].append(seconds)
+            self.threads[endpoint] = max(self.threads[endpoint], thread_count)
+            self.peak_threads = max(self.peak_threads, thread_count)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def complete(self) -> None:
+        """
+        Record a session that reached the display page.
+        """
+        with self._lock:
+            self.completed += 1
+
+
+class LockErrorCounter(logging.Handler):
+    """
+    Logging handler counting SQLite "database is locked" errors per endpoint.
+
+    Errors are matched in the message and in the attached exception, which is
+    where Flask puts them for "Exception on <path>" records. Errors logged
+    outside a request come from report jobs.
+    """
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.counts = defaultdict(int)
+        self._counts_lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        error = record.exc_info[1] if record.exc_info else None
+        if "database is locked" not in record.getMessage() and (
+            error is None or "database is locked" not in str(error)
+        ):
+            return
+        endpoint = request.path if has_request_context() else "report job"
+        with self._counts_lock:
+            self.counts[endpoint] += 1
+
+
+def _percentile(values: list, percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def _timed(stats: Stats, endpoint: str, expected: tuple, send) -> requests.Response | None:
+    start = time.perf_counter()
+    try:
+        response = send()
+    except requests.RequestException:
+        stats.record(endpoint, time.perf_counter() - start, False)
+        return None
+    ok = response.status_code in expected
+    stats.record(endpoint, time.perf_counter() - start, ok)
+    return response if ok else None
+
+
+def run_session(base: str, username: str, year: int, stats: Stats,
+                poll_interval: float, timeout: float) -> None:
+    """
+    Drive one user from login to the display page.
+
+    Args:
+        base (str): The application URL.
+        username (str): The simulated GitLab username.
+        year (int): The report year.
+        stats (Stats): The collector.
+        poll_interval (float): Seconds between wait page polls.
+        timeout (float): Seconds to wait for the report.
+    """
+    with requests.Session() as http:
+        response = _timed(stats, "/login", (302,), lambda: http.get(
+            f"{base}/login", allow_redirects=False, timeout=30))
+        if response is None:
+            return
+        # The OAuth stub lives on the fake GitLab and is not measured.
+        authorize = http.get(f"{response.headers['Location']}&login={username}",
+                             allow_redirects=False, timeout=30)
+        callback_url = authorize.headers["Location"]
+
+        if _timed(stats, "/callback", (302,), lambda: http.get(
+                callback_url, allow_redirects=False, timeout=30)) is None:
+            return
+        if _timed(stats, "/dashboard", (200,), lambda: http.get(
+                f"{base}/dashboard", allow_redirects=False, timeout=30)) is None:
+            return
+        payload = {"access_token": f"token-{username}", "username": username,
+                   "timezone": "Asia/Shanghai", "year": year}
+        if _timed(stats, "/load", (200,), lambda: http.post(
+                f"{base}/load", json=payload, timeout=30)) is None:
+            return
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            response = _timed(stats, "/wait", (200, 302), lambda: http.get(
+                f"{base}/wait", allow_redirects=False, timeout=30))
+            if response is None:
+                return
+            if response.status_code == 302:
+                break
+            time.sleep(poll_interval)
+        else:
+            return
+
+        if _timed(stats, "/display", (200,), lambda: http.get(
+                f"{base}/display", allow_redirects=False, timeout=30)) is not None:
+            stats.complete()
+
+
+def main() -> None:
+    """
+    Run the load test and print the report.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--sessions", type=int, default=50, help="simulated users")
+    parser.add_argument("--concurrency", type=int, default=10, help="users at once")
+    parser.add_argument("--projects", type=int, default=20, help="projects on the fake GitLab")
+    parser.add_argument("--commits", type=int, default=100, help="commits per project")
+    parser.add_argument("--year", type=int, default=2024)
+    parser.add_argument("--port", type=int, default=5001, help="port of the application")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds per report")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="my-github-2024-loadtest-")
+    os.chdir(workdir)
+
+    fake_gitlab.start(projects=args.projects, commits=args.commits, year=args.year)
+
+    spec = importlib.util.spec_from_file_location("my_github_2024", ROOT / "my-github-2024.py")
+    module = importlib.util.module_from_spec(spec)
+    # Flask finds templates and static files through the module registry.
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    app = module.create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{workdir}/loadtest.db",
+        "PROJECT_METADATA_DB": f"{workdir}/project-metadata.db",
+    })
+    app.debug = False
+    with app.app_context():
+        module.db.create_all()
+
+    lock_errors = LockErrorCounter()
+    logging.getLogger().addHandler(lock_errors)
+
+    server = make_server("127.0.0.1", args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="app-server", daemon=True).start()
+    base = f"http://127.0.0.1:{args.port}"
+
+    stats = Stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency,
+                            thread_name_prefix=CLIENT_THREAD_PREFIX) as executor:
+        futures = [
+            executor.submit(run_session, base, f"user{index}", args.year, stats,
+                            args.poll_interval, args.timeout)
+            for index in range(args.sessions)
+        ]
+        while not all(future.done() for future in futures):
+            stats.sample_threads()
+            time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    print(f"{args.sessions} sessions, concurrency {args.concurrency}, {elapsed:.1f} s, "
+          f"{stats.completed} reports displayed")
+    print(f"{'endpoint':<12}{'requests':>10}{'errors':>8}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p99 ms':>9}{'locked':>8}{'threads':>9}")
+    for endpoint in ("/login", "/callback", "/dashboard", "/load", "/wait", "/display"):
+        latencies = stats.latencies[endpoint]
+        if not latencies:
+            continue
+        print(f"{endpoint:<12}{len(latencies):>10}{stats.errors[endpoint]:>8}"
+              f"{len(latencies) / elapsed:>9.1f}"
+              f"{_percentile(latencies, 50) * 1000:>9.1f}"
+              f"{_percentile(latencies, 99) * 1000:>9.1f}"
+              f"{lock_errors.counts[endpoint]:>8}"
+              f"{stats.threads[endpoint]:>9}")
+    print(f"peak application threads: {stats.peak_threads}")
+    print(f"database lock errors in report jobs: {lock_errors.counts['report job']}")
+    print(f"logs and database: {workdir}")
+
+
+if __name__ == "__main__":
+    main()
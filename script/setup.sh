@@ -9,7 +9,7 @@ if [[ "$response" != "y" && "$response" != "Y" ]]; then
 fi
 
 # Update package list and install necessary packages
-apt update && apt install -y python3.12 python3-pip nginx certbot python3-certbot-nginx python3-virtualenv || { echo "Failed to install packages"; exit 1; }
+apt update && apt install -y python3.12 python3-pip nginx libnginx-mod-http-brotli-static certbot python3-certbot-nginx python3-virtualenv || { echo "Failed to install packages"; exit 1; }
 
 # Create and navigate to the web directory
 mkdir -p /var/www || { echo "Failed to create directory"; exit 1; }
@@ -29,7 +29,7 @@ sed -i 's/2024.ch3nyang.top/YOUR_URL/g' my-github-2024
 # Set up virtual environment and install dependencies
 virtualenv venv --python=python3.12 || { echo "Failed to create virtual environment"; exit 1; }
 source venv/bin/activate || { echo "Failed to activate virtual environment"; exit 1; }
-pip3 install -r requirements.txt || { echo "Failed to install dependencies"; exit 1; }
+pip3 install -r requirements.txt -r requirements-build.txt || { echo "Failed to install dependencies"; exit 1; }
 
 # Obtain SSL certificate
 certbot --nginx -d YOUR_URL || { echo "Failed to obtain SSL certificate"; exit 1; }
@@ -0,0 +1,63 @@
+"""
+Measure the cold start of the application.
+
+Each run starts a fresh interpreter that imports ``my-github-2024.py`` and calls
+``create_app``, and reports the import and factory times and whether the GitLab
+fetch stack was imported along the way.
+
+Usage:
+    python3 script/startup_time.py --runs 5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in the child interpreter, from the repository root
+PROBE = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("my_github_2024", "my-github-2024.py")
+module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+module.create_app()
+ready = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "ready_ms": (ready - start) * 1000,
+    "fetch_stack": sorted(m for m in ("aiohttp", "pytz", "requests") if m in sys.modules),
+}))
+"""
+
+
+def main() -> None:
+    """
+    Run the probe several times and print the median timings.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+
+    import_ms = statistics.median(result["import_ms"] for result in results)
+    ready_ms = statistics.median(result["ready_ms"] for result in results)
+    print(f"{args.runs} runs, median import {import_ms:.1f} ms, "
+          f"import to ready {ready_ms:.1f} ms")
+    print(f"fetch stack imported at startup: {', '.join(results[0]['fetch_stack']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Module providing in-process caches shared by the Flask views and the fetch layer.
+
+Classes:
+    TTLCache: A thread-safe mapping with per-entry expiry and LRU eviction.
+    ProjectMetadataCache: Per-project metadata persisted in SQLite.
+
+Functions:
+    get_profile(token: str, username: str | None = None) -> dict | None:
+        Get the cached GitLab profile resolved with the given token.
+    put_profile(token: str, profile: dict, owner: bool = False) -> None:
+        Cache a GitLab profile resolved with the given token.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    A thread-safe mapping whose entries expire after ``ttl`` seconds.
+
+    When more than ``maxsize`` entries are stored, the least recently used
+    entry is evicted.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Get the value for the key if it is present and not expired.
+
+        Args:
+            key: The key.
+            default: The value returned on a miss.
+
+        Returns:
+            The cached value, or ``default``.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        """
+        Store the value for the key, evicting the least recently used entry if full.
+
+        Args:
+            key: The key.
+            value: The value.
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+profile_cache = TTLCache(maxsize=1024, ttl=600)
+
+
+def _token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def get_profile(token: str, username: str | None = None) -> dict | None:
+    """
+    Get the cached GitLab profile resolved with the given token.
+
+    Args:
+        token (str): The GitLab access token.
+        username (str | None): The username, or None for the token owner.
+
+    Returns:
+        dict | None: The profile attributes as returned by ``/api/v4/user``,
+            or None on a miss.
+    """
+    return profile_cache.get((_token_hash(token), username))
+
+
+def put_profile(token: str, profile: dict, owner: bool = False) -> None:
+    """
+    Cache a GitLab profile resolved with the given token.
+
+    Args:
+        token (str): The GitLab access token.
+        profile (dict): The profile attributes, including ``username``.
+        owner (bool): Whether the profile belongs to the token owner, i.e. it
+            comes from ``/api/v4/user``.
+    """
+    token_hash = _token_hash(token)
+    profile_cache.set((token_hash, profile["username"]), profile)
+    if owner:
+        profile_cache.set((token_hash, None), profile)
+
+
+class ProjectMetadataCache:
+    """
+    Per-project metadata that costs an API call per project (currently the
+    language breakdown), shared by all report jobs and persisted in SQLite
+    across restarts.
+
+    Entries are keyed by project id and ``last_activity_at``. Once a project has
+    new activity, its entry is stale and the next report fetches it again.
+
+    ``load`` and ``put_many`` touch the disk and must run off the event loop;
+    ``get`` only reads memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS project_metadata ("
+            "project_id INTEGER PRIMARY KEY, last_activity_at TEXT NOT NULL, "
+            "metadata TEXT NOT NULL)"
+        )
+        return connection
+
+    def load(self) -> None:
+        """
+        Read the stored metadata into memory, once.
+        """
+        if self._data is not None:
+            return
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT project_id, last_activity_at, metadata FROM project_metadata"
+            ).fetchall()
+        finally:
+            connection.close()
+        data = {
+            project_id: (last_activity_at, json.loads(metadata))
+            for project_id, last_activity_at, metadata in rows
+        }
+        with self._lock:
+            if self._data is None:
+                self._data = data
+
+    def get(self, project_id: int, last_activity_at: str) -> dict | None:
+        """
+        Get the metadata of a project if it is up to date.
+
+        Args:
+            project_id (int): The project id.
+            last_activity_at (str): The current ``last_activity_at`` of the project.
+
+        Returns:
+            dict | None: The metadata, or None if missing, stale or not loaded yet.
+        """
+        with self._lock:
+            item = self._data.get(project_id) if self._data is not None else None
+        if item is None or item[0] != last_activity_at:
+            return None
+        return item[1]
+
+    def put_many(self, entries: list) -> None:
+        """
+        Store the metadata of several projects.
+
+        Args:
+            entries (list): ``(project_id, last_activity_at, metadata)`` tuples.
+        """
+        if not entries:
+            return
+        self.load()
+        with self._lock:
+            for project_id, last_activity_at, metadata in entries:
+                self._data[project_id] = (last_activity_at, metadata)
+
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO project_metadata "
+                    "(project_id, last_activity_at, metadata) VALUES (?, ?, ?)",
+                    [
+                        (project_id, last_activity_at, json.dumps(metadata))
+                        for project_id, last_activity_at, metadata in entries
+                    ],
+                )
+        finally:
+            connection.close()
+
+
+# The Flask instance folder, next to the application database
+project_metadata_cache = ProjectMetadataCache(
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 "instance", "project-metadata.db")
+)
@@ -4,8 +4,11 @@ Module for generating context data for GitHub statistics.
 Functions:
     get_context(username: str, token: str, year: int, time_zone: str) -> dict:
         Generate context data for the given year from the provided data.
+    get_context_async(username: str, token: str, year: int, time_zone: str) -> dict:
+        Coroutine version of ``get_context`` for the fetch engine.
 """
 
+import asyncio
 import calendar
 import logging
 import re
@@ -16,7 +19,7 @@ from itertools import groupby
 import pytz
 
 from log.logging_config import setup_logging
-from util.fetch_data import get_gitlab_info
+from util.fetch_data import get_gitlab_info, get_gitlab_info_async
 
 setup_logging()
 
@@ -104,6 +107,44 @@ def get_context(baseurl:str,username: str, token: str, year: int, time_zone: str
 
     data = get_gitlab_info(baseurl,username, token, year)
 
+    return _build_context(data, username, year)
+
+
+async def get_context_async(baseurl: str, username: str, token: str, year: int,
+                            time_zone: str) -> dict:  # pylint: disable=unused-argument
+    """
+    Coroutine version of ``get_context``, run on the fetch engine loop.
+
+    Args:
+        username (str): The GitLab username.
+        token (str): The GitLab access token.
+        year (int): The year to generate the context data.
+        time_zone (str): The timezone. Ignored like in ``get_context``: commit
+            hours are always reported in Asia/Shanghai by ``util.fetch_data``.
+
+    Returns:
+        dict: The context data.
+    """
+
+    logging.info("Generating context data for GitLab statistics...")
+
+    data = await get_gitlab_info_async(baseurl,username, token, year)
+
+    return await asyncio.to_thread(_build_context, data, username, year)
+
+
+def _build_context(data: dict, username: str, year: int) -> dict:
+    """
+    Build the context data from the fetched GitLab data.
+
+    Args:
+        data (dict): The data returned by ``get_gitlab_info``.
+        username (str): The GitLab username.
+        year (int): The year of the data.
+
+    Returns:
+        dict: The context data.
+    """
     # 结果字典
 
     # if "others" in commit_type_num:
@@ -1,45 +1,280 @@
 """
-This module provides functions to fetch GitHub data using the GitHub GraphQL API.
+This module provides functions to fetch GitLab data using the GitLab REST API.
+
+All report jobs share one ``FetchEngine``: a single event loop thread that runs
+every job's requests through one aiohttp session, so the number of concurrent
+requests is capped for the whole process. Each job is also capped at a share of
+that limit, so a report with hundreds of projects cannot queue ahead of the
+requests of every report submitted after it.
+
+Classes:
+    GitLabError: Raised when the GitLab API returns an error status.
+    GitLabClient: Minimal async client for the GitLab REST API v4.
+    FetchEngine: Event loop thread shared by all report jobs.
 
 Functions:
-    get_github_info(username: str, token: str, year: int) -> dict:
-        Get the GitHub information for the given year.
+    get_engine() -> FetchEngine:
+        Get the process-wide fetch engine.
+    get_gitlab_info_async(baseurl: str, username: str, token: str, year: int) -> dict:
+        Get the GitLab information for the given year.
+    get_gitlab_info(baseurl: str, username: str, token: str, year: int) -> dict:
+        Blocking wrapper around ``get_gitlab_info_async``.
 """
+import asyncio
 import calendar
 import logging
+import threading
 from datetime import datetime
 from itertools import groupby
 
-import gitlab
+import aiohttp
 import pytz
-import requests
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 
 from log.logging_config import setup_logging
+from util.cache import get_profile, project_metadata_cache, put_profile
 from collections import defaultdict, Counter
 import util.context
 
 
 setup_logging()
 
+MAX_CONCURRENT_REQUESTS = 32
+# Requests in flight for one report job, within MAX_CONCURRENT_REQUESTS
+MAX_JOB_REQUESTS = 16
+PER_PAGE = 100
+# Rate limits and transient server errors are retried, as python-gitlab does for 429
+MAX_ATTEMPTS = 10
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Errors meaning a list is not available for a project, e.g. a disabled feature
+SKIPPED_STATUSES = {400, 403, 404}
+# Branch to read commits from, or None to read every ref of the repository
+COMMIT_REF_NAME = None
+
+
+async def _gather(*coros) -> list:
+    """
+    Run coroutines concurrently and return their results in order.
+
+    Unlike ``asyncio.gather``, the remaining coroutines are cancelled as soon as
+    one fails, so a failed job stops using the connections shared by all jobs.
+    The first error is raised as is rather than wrapped in an ``ExceptionGroup``.
+    """
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(coro) for coro in coros]
+    except ExceptionGroup as errors:
+        raise errors.exceptions[0] from errors
+    return [task.result() for task in tasks]
+
+
+class GitLabError(Exception):
+    """
+    Raised when the GitLab API returns an error status.
+    """
+
+    def __init__(self, status: int, message: str, retry_after: float | None = None):
+        super().__init__(f"{status} {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _is_transient(error: BaseException) -> bool:
+    if isinstance(error, GitLabError):
+        return error.status in RETRY_STATUSES
+    return isinstance(error, aiohttp.ClientConnectionError)
+
+
+_backoff = wait_exponential(multiplier=0.5, max=30)
+
+
+def _retry_wait(retry_state) -> float:
+    error = retry_state.outcome.exception()
+    if isinstance(error, GitLabError) and error.retry_after is not None:
+        return error.retry_after
+    return _backoff(retry_state)
+
+
+class GitLabClient:
+    """
+    Minimal async client for the GitLab REST API v4.
+
+    Each report job uses its own client, which sends at most ``max_requests``
+    requests at a time. Retries wait without holding a slot.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, baseurl: str, token: str,
+                 max_requests: int = MAX_JOB_REQUESTS):
+        self._session = session
+        self._api_url = baseurl.rstrip("/") + "/api/v4"
+        self._headers = {"Authorization": f"Bearer {token}"}
+        self._semaphore = asyncio.Semaphore(max_requests)
+
+    @retry(retry=retry_if_exception(_is_transient), wait=_retry_wait,
+           stop=stop_after_attempt(MAX_ATTEMPTS), reraise=True)
+    async def _request(self, path: str, params: dict | None = None):
+        query = {
+            key: str(value).lower() if isinstance(value, bool) else str(value)
+            for key, value in (params or {}).items()
+        }
+        async with self._semaphore, self._session.get(
+            self._api_url + path, params=query, headers=self._headers
+        ) as response:
+            if response.status >= 400:
+                retry_after = response.headers.get("Retry-After", "")
+                raise GitLabError(
+                    response.status,
+                    f"{path}: {await response.text()}",
+                    float(retry_after) if retry_after.isdigit() else None,
+                )
+            return await response.json(), response.headers
+
+    async def get(self, path: str, **params):
+        """
+        Get a single resource.
+
+        Args:
+            path (str): The API path, e.g. ``/user``.
+            **params: The query parameters.
+
+        Returns:
+            The decoded JSON response.
+        """
+        result, _ = await self._request(path, params)
+        return result
+
+    async def list(self, path: str, **params) -> list:
+        """
+        Get every page of a collection.
+
+        The remaining pages are fetched concurrently when GitLab reports the
+        page count, and one after another otherwise.
+
+        Args:
+            path (str): The API path, e.g. ``/projects``.
+            **params: The query parameters.
+
+        Returns:
+            list: The items of all pages.
+        """
+        params["per_page"] = PER_PAGE
+        items, headers = await self._request(path, params)
+        total_pages = headers.get("X-Total-Pages")
+        if total_pages:
+            pages = await _gather(
+                *(
+                    self._request(path, {**params, "page": page})
+                    for page in range(2, int(total_pages) + 1)
+                )
+            )
+            for page_items, _ in pages:
+                items.extend(page_items)
+            return items
+
+        next_page = headers.get("X-Next-Page")
+        while next_page:
+            page_items, headers = await self._request(path, {**params, "page": next_page})
+            items.extend(page_items)
+            next_page = headers.get("X-Next-Page")
+        return items
+
+
+class FetchEngine:
+    """
+    Event loop thread shared by all report jobs.
+
+    Jobs are submitted as coroutines from any thread. Their requests go through
+    one aiohttp session whose connector allows at most ``max_connections``
+    requests in flight across all jobs, and each job's client at most
+    ``MAX_JOB_REQUESTS`` of them.
+    """
+
+    def __init__(self, max_connections: int = MAX_CONCURRENT_REQUESTS):
+        self.max_connections = max_connections
+        self._session = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="gitlab-fetch", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the engine loop.
+
+        Args:
+            coro: The coroutine.
+
+        Returns:
+            concurrent.futures.Future: The future of the coroutine result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def client(self, baseurl: str, token: str) -> GitLabClient:
+        """
+        Create a client bound to the shared session, one per report job. Must be
+        called on the engine loop.
+
+        Args:
+            baseurl (str): The GitLab base URL.
+            token (str): The GitLab access token.
+
+        Returns:
+            GitLabClient: The client.
+        """
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60),
+            )
+        return GitLabClient(self._session, baseurl, token)
 
-# Initialize the GitLab API client
-def initialize_gitlab_client(baseurl:str,token: str):
-    gl = gitlab.Gitlab(baseurl, oauth_token=token)
-    return gl
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> FetchEngine:
+    """
+    Get the process-wide fetch engine, starting it on first use.
+
+    Returns:
+        FetchEngine: The fetch engine.
+    """
+    global _engine  # pylint: disable=global-statement
+    with _engine_lock:
+        if _engine is None:
+            _engine = FetchEngine()
+        return _engine
 
 
 # Fetch user information
-def _get_basic(user_name: str, gl) -> dict:
-    user = gl.users.list(username=user_name)[0]
-    logging.info("Fetching GitLab basic data. %s", user)
+async def _get_basic(user_name: str, client: GitLabClient, token: str) -> dict:
+    profile = get_profile(token, user_name)
+    if profile is not None:
+        logging.info("Using cached GitLab profile for %s", user_name)
+    else:
+        # Resolve the token owner through /user like /dashboard does, so the private
+        # email used for commit attribution is the same on a cache hit and a miss.
+        profile = await client.get("/user")
+        if profile["username"] == user_name:
+            put_profile(token, profile, owner=True)
+        else:
+            profile = (await client.get("/users", username=user_name))[0]
+            put_profile(token, profile)
+    logging.info("Fetching GitLab basic data. %s", profile)
+
+    followers, followings = await _gather(
+        client.list(f"/users/{profile['id']}/followers"),
+        client.list(f"/users/{profile['id']}/following"),
+    )
 
     # Days since account creation
     existdays = (
         (
             (
                 datetime.now(pytz.UTC)
-                - datetime.strptime(user.created_at, "%Y-%m-%dT%H:%M:%S.%f%z")
+                - datetime.strptime(profile["created_at"], "%Y-%m-%dT%H:%M:%S.%f%z")
             ).days
             + 99
         )
@@ -47,120 +282,218 @@ def _get_basic(user_name: str, gl) -> dict:
         * 100
     )
     return {
-        "id": user.id,
-        "name": user.name,
-        "avatar_url": user.avatar_url,
-        "followers": len(user.followers_users.list()),
-        "followings": len(user.following_users.list()),
-        "created_time": user.created_at,
-        "email": user.email,
+        "id": profile["id"],
+        "name": profile["name"],
+        "avatar_url": profile["avatar_url"],
+        "followers": len(followers),
+        "followings": len(followings),
+        "created_time": profile["created_at"],
+        "email": profile.get("email"),
         "existdays": existdays
 
     }
 
+# Drop projects that were not touched during the year
+def _prune_projects(projects: list, year: int) -> list:
+    year_start = datetime(year, 1, 1, tzinfo=pytz.UTC)
+    year_end = datetime(year + 1, 1, 1, tzinfo=pytz.UTC)
+    active_projects = [
+        project
+        for project in projects
+        if datetime.fromisoformat(project["last_activity_at"]) >= year_start
+        and datetime.fromisoformat(project["created_at"]) < year_end
+    ]
+    # Projects without activity since the start of the year are already left out
+    # of the listing by the server. Every project pruned here on top of that saves
+    # its members lookup, and the languages, commits, merge request and issue
+    # queries when the user is a member.
+    pruned = len(projects) - len(active_projects)
+    logging.info(
+        "Kept %d of %d listed projects active in %d, saving %d-%d API calls",
+        len(active_projects), len(projects), year, pruned, pruned * 6,
+    )
+    return active_projects
+
+
+async def _list_or_empty(client: GitLabClient, path: str, **params) -> list:
+    try:
+        return await client.list(path, **params)
+    except GitLabError as error:
+        if error.status not in SKIPPED_STATUSES:
+            raise
+        return []
+
+
+# Get the cached metadata of a project, fetching it on a miss
+async def _get_project_metadata(client: GitLabClient, project: dict):
+    metadata = project_metadata_cache.get(project["id"], project["last_activity_at"])
+    if metadata is not None:
+        return metadata, False
+    metadata = {"languages": await client.get(f"/projects/{project['id']}/languages")}
+    return metadata, True
+
+
+# Fetch the commits of the year, from every ref unless COMMIT_REF_NAME is set
+async def _list_commits(client: GitLabClient, project_path: str, year: int) -> list:
+    refs = {"ref_name": COMMIT_REF_NAME} if COMMIT_REF_NAME else {"all": True}
+    return await client.list(f"{project_path}/repository/commits", **refs,
+                             since=f'{year}-01-01T00:00:00Z', until=f'{year}-12-31T23:59:59Z')
+
+
+# Fetch the commits of one project that no other project of the job has returned yet,
+# reduced to the project's counters. The loop runs one coroutine at a time, so claiming
+# SHAs needs no lock; the listing is dropped as soon as it is reduced.
+async def _get_project_commits(client: GitLabClient, project_path: str, year: int,
+                               user_identifiers: set, seen_shas: set) -> dict:
+    new_commits = []
+    for commit in await _list_commits(client, project_path, year):
+        sha = bytes.fromhex(commit["id"])
+        if sha in seen_shas:
+            continue
+        seen_shas.add(sha)
+        new_commits.append(commit)
+    return await asyncio.to_thread(_summarize_commits, new_commits, user_identifiers)
+
+
+# Reduce the commits of one project to the counters of the report
+def _summarize_commits(commit_list: list, user_identifiers: set) -> dict:
+    commits = []
+    user_commits = 0  # 统计该用户作为提交者的提交数量
+    reviewer_commits = 0  # 统计该用户作为审核者的提交数量
+    commit_type_num = defaultdict(int)
+    commit_time_num = [0] * 24
+    contribution_calendar = []
+    for commit in commit_list:
+        commit_data = {
+            "message": commit["message"],
+            "committedDate": commit["created_at"],
+        }
+
+        # 判断该用户是否是提交者
+        if commit["author_name"] in user_identifiers or commit["author_email"] in user_identifiers:
+            commit_type = util.context._get_commit_type(commit_data["message"])
+            commit_type_num[commit_type] += 1
+
+            # 处理 commit_time
+            commit_time = util.context._parse_time(commit_data["committedDate"],
+                                                   pytz.timezone('Asia/Shanghai')).hour
+            commit_time_num[commit_time] += 1
+            contribution_calendar.append(commit["created_at"][:10])
+
+            commits.append(commit_data)
+            user_commits += 1  # 作为提交者的提交数量
+
+        # 判断该用户是否是审核者（committer_name）
+        if (commit["committer_name"] in user_identifiers
+                or commit["committer_email"] in user_identifiers):
+            reviewer_commits += 1  # 作为审核者的提交数量
+
+    return {
+        "commits": commits,
+        "user_commits": user_commits,
+        "reviewer_commits": reviewer_commits,
+        "commit_type_num": commit_type_num,
+        "commit_time_num": commit_time_num,
+        "contribution_calendar": contribution_calendar,
+    }
+
+
+async def _count_or_zero(client: GitLabClient, path: str, **params) -> int:
+    return len(await _list_or_empty(client, path, **params))
+
+
+# Fetch the activity of the user in one project reduced to counters, or None if not a member.
+# user holds the user "id" and the "identifiers" commits are attributed by.
+async def _get_project_activity(client: GitLabClient, project: dict, user: dict, year: int,
+                                seen_shas: set):
+    project_path = f"/projects/{project['id']}"
+    members = await client.list(f"{project_path}/members")
+    if not any(member["id"] == user["id"] for member in members):
+        return None
+
+    (metadata, fresh_metadata), commits, created_mrs, assigned_mrs, issues = await _gather(
+        _get_project_metadata(client, project),
+        _get_project_commits(client, project_path, year, user["identifiers"], seen_shas),
+        _count_or_zero(client, f"{project_path}/merge_requests", scope="created_by_me",
+                       created_after=f'{year}-01-01', created_before=f'{year}-12-31'),
+        _count_or_zero(client, f"{project_path}/merge_requests", scope="assigned_to_me ",
+                       created_after=f'{year}-01-01', created_before=f'{year}-12-31'),
+        _count_or_zero(client, f"{project_path}/issues", assignee_id=user["id"],
+                       created_after=f'{year}-01-01', created_before=f'{year}-12-31'),
+    )
+    return {
+        "metadata": metadata,
+        "fresh_metadata": fresh_metadata,
+        "commits": commits,
+        "mr_num": created_mrs + assigned_mrs,
+        "issue_num": issues,
+    }
+
+
 # Fetch repositories
-def _get_repo(user_name: str,user_email:str, user_id: str, gl, year: int):
-    projects = gl.projects.list(get_all=True,keep_base_url=True)
+async def _get_repo(user_name: str,user_email:str, user_id: int, client: GitLabClient, year: int):
+    projects = await client.list("/projects", last_activity_after=f"{year}-01-01T00:00:00Z")
+    projects = _prune_projects(projects, year)
+    await asyncio.to_thread(project_metadata_cache.load)
+    user = {"id": user_id, "identifiers": {user_name, user_email}}
+    # SHAs already attributed, so a commit reachable from several refs or forks counts once
+    seen_shas = set()
+    activities = await _gather(
+        *(_get_project_activity(client, project, user, year, seen_shas)
+          for project in projects)
+    )
+    fresh_metadata = [
+        (project["id"], project["last_activity_at"], activity["metadata"])
+        for project, activity in zip(projects, activities)
+        if activity is not None and activity["fresh_metadata"]
+    ]
+    logging.info("Fetched metadata of %d projects", len(fresh_metadata))
+    await asyncio.to_thread(project_metadata_cache.put_many, fresh_metadata)
+    # The aggregation is CPU-bound, keep it off the loop shared by every report job
+    return await asyncio.to_thread(_summarize_repo, projects, activities, year)
+
+
+# Aggregate the per-project counters into the repository and contribution statistics
+def _summarize_repo(projects: list, activities: list, year: int):
     all_repos = {}
     contribution_calendar = []
     commit_count = 0
 
     mr_count = 0
     issues_count = 0
-    issues = []
 
     commit_type_num = defaultdict(int)
     commit_time_num = [0] * 24
     language_in_repos = []
-    for project in projects:
-        members = project.members.list(get_all=True)
-
-        for member in members:
-            if member.id == user_id:
-                repo_name = project.name
-                created_at = project.created_at
-                # 如果仓库是在给定年份创建的，则获取该年份的提交记录
-                commits = []
-                user_commits = 0  # 统计该用户作为提交者的提交数量
-                reviewer_commits = 0  # 统计该用户作为审核者的提交数量
-                # 获取仓库的语言统计
-                repo_languages = project.languages()
-                language_in_repos.append(repo_languages)
-                # 获取该仓库的提交记录
-                commit_list = project.commits.list(ref_name = "develop",since=f'{year}-01-01T00:00:00Z', until=f'{year}-12-31T23:59:59Z',
-                                                get_all=True,keep_base_url=True)
-
-                user_identifiers = {user_name, user_email}
-                for commit in commit_list:
-
-                    commit_data = {
-                        "message": commit.message,
-                        "committedDate": commit.created_at,
-                    }
-
-                    # 判断该用户是否是提交者
-                    if commit.author_name in user_identifiers or commit.author_email in user_identifiers:
-                        commit_type = util.context._get_commit_type(commit_data["message"])
-                        commit_type_num[commit_type] += 1
-
-                        # 处理 commit_time
-                        commit_time = util.context._parse_time(commit_data["committedDate"], pytz.timezone('Asia/Shanghai')).hour
-                        commit_time_num[commit_time] += 1
-                        contribution_calendar.append(commit.created_at[:10])
-
-                        commits.append(commit_data)
-                        user_commits += 1  # 作为提交者的提交数量
-
-
-                    # 判断该用户是否是审核者（committer_name）
-                    if commit.committer_name in user_identifiers or commit.committer_email in user_identifiers:
-                        reviewer_commits += 1  # 作为审核者的提交数量
-
-                commit_count += user_commits
-
-                try:
-                    # merge
-                    created_at_merge_requests = project.mergerequests.list(scope="created_by_me", created_after=f'{year}-01-01',
-                                                                     created_before=f'{year}-12-31',
-                                                                     get_all=True)
-                except gitlab.exceptions.GitlabError:
-                    created_at_merge_requests = []
-
-                try:
-                    assigned_to_merge_requests = project.mergerequests.list(scope="assigned_to_me ", created_after=f'{year}-01-01',
-                                                                     created_before=f'{year}-12-31',
-                                                                     get_all=True)
-                except gitlab.exceptions.GitlabError:
-                    assigned_to_merge_requests = []
-
-
-                mr_count += len(created_at_merge_requests)
-                mr_count += len(assigned_to_merge_requests)
-
-                try:
-                    # merge
-                    issues = project.issues.list(assignee_id=user_id, created_after=f'{year}-01-01',
-                                                                     created_before=f'{year}-12-31',
-                                                                     get_all=True)
-                except gitlab.exceptions.GitlabError:
-                    issues = []
-
-                issues_count += len(issues)
-
-
-                # 保存仓库的数据，包括用户作为提交者和审核者的统计
-                all_repos[repo_name] = {
-                    "stargazerCount": project.star_count,
-                    "forkCount": project.forks_count,
-                    "isPrivate": project.visibility == 'private',
-                    "createdAt": created_at,
-                    "languages": repo_languages,
-                    "commits": commits,
-                    "userCommits": user_commits,  # 该用户作为提交者的提交数量
-                    "reviewerCommits": reviewer_commits,  # 该用户作为审核者的提交数量
-                }
-                # 后续相关代码逻辑
-                break
+    for project, activity in zip(projects, activities):
+        if activity is None:
+            continue
+
+        # 获取仓库的语言统计
+        repo_languages = activity["metadata"]["languages"]
+        language_in_repos.append(repo_languages)
+        commits = activity["commits"]
+        for commit_type, count in commits["commit_type_num"].items():
+            commit_type_num[commit_type] += count
+        for hour, count in enumerate(commits["commit_time_num"]):
+            commit_time_num[hour] += count
+        contribution_calendar.extend(commits["contribution_calendar"])
+
+        commit_count += commits["user_commits"]
+        mr_count += activity["mr_num"]
+        issues_count += activity["issue_num"]
+
+        # 保存仓库的数据，包括用户作为提交者和审核者的统计
+        all_repos[project["name"]] = {
+            "stargazerCount": project["star_count"],
+            "forkCount": project["forks_count"],
+            "isPrivate": project.get("visibility") == 'private',
+            "createdAt": project["created_at"],
+            "languages": repo_languages,
+            "commits": commits["commits"],
+            "userCommits": commits["user_commits"],  # 该用户作为提交者的提交数量
+            "reviewerCommits": commits["reviewer_commits"],  # 该用户作为审核者的提交数量
+        }
 
     languages = [lang for item in language_in_repos if item for lang in item.keys()]
     language_counts = Counter(languages)
@@ -247,12 +580,12 @@ def _get_repo(user_name: str,user_email:str, user_id: str, gl, year: int):
 
 
 # Main function to gather GitLab data
-def get_gitlab_info(baseurl:str,username: str, token: str, year: int) -> dict:
-    gl = initialize_gitlab_client(baseurl,token)
+async def get_gitlab_info_async(baseurl:str,username: str, token: str, year: int) -> dict:
+    client = get_engine().client(baseurl, token)
 
     logging.info("Processing basic info: username=%s", username)
 
-    basic_info = _get_basic(username, gl)
+    basic_info = await _get_basic(username, client, token)
     logging.info("Basic info: %s", basic_info)
 
     if not basic_info["id"]:
@@ -264,7 +597,7 @@ def get_gitlab_info(baseurl:str,username: str, token: str, year: int) -> dict:
     logging.info("Processing repos for user_id=%s", user_id)
     logging.info("Processing contributions for user=%s", username)
 
-    repo_info,contribution_info = _get_repo(username,user_email,user_id, gl, year)
+    repo_info,contribution_info = await _get_repo(username,user_email,user_id, client, year)
 
     return {
         "basic": basic_info,
@@ -273,3 +606,9 @@ def get_gitlab_info(baseurl:str,username: str, token: str, year: int) -> dict:
 
     }
 
+
+def get_gitlab_info(baseurl:str,username: str, token: str, year: int) -> dict:
+    """
+    Blocking wrapper around ``get_gitlab_info_async``. Must not be called on the engine loop.
+    """
+    return get_engine().submit(get_gitlab_info_async(baseurl, username, token, year)).result()